@@ -3,6 +3,9 @@ import os
 
 import asyncpg
 
+from .query_engine import Query, merge_shard_results
+from .sharding import shard_dsns_from_env, shard_for_creator
+
 
 def _build_dsn_from_env() -> str | None:
     """
@@ -24,35 +27,70 @@ def _build_dsn_from_env() -> str | None:
 
 
 class Database:
-    def __init__(self):
-        self._pool: asyncpg.Pool | None = None
-        self._dsn = _build_dsn_from_env()
+    """
+    Один или несколько шардов PostgreSQL. Креатор целиком (videos + snapshots)
+    лежит на шарде shard_for_creator(creator_id); без DATABASE_SHARD_DSNS шард один.
+    """
 
-    async def connect(self):
-        if not self._dsn:
-            raise RuntimeError("DB DSN is empty. Check .env/docker-compose env vars.")
+    def __init__(self, dsns: list[str] | None = None):
+        self._pools: list[asyncpg.Pool] = []
+        self._dsns = dsns or shard_dsns_from_env() or [_build_dsn_from_env()]
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._dsns)
 
+    async def _create_pool(self, dsn: str) -> asyncpg.Pool:
         last_err = None
         for _ in range(30):
             try:
-                self._pool = await asyncpg.create_pool(dsn=self._dsn, min_size=1, max_size=10)
-                return
+                return await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=10)
             except Exception as e:
                 last_err = e
                 await asyncio.sleep(1)
 
         raise last_err
 
+    async def connect(self):
+        if not all(self._dsns):
+            raise RuntimeError("DB DSN is empty. Check .env/docker-compose env vars.")
+
+        self._pools = list(await asyncio.gather(*(self._create_pool(dsn) for dsn in self._dsns)))
+
     async def close(self):
-        if self._pool:
-            await self._pool.close()
-            self._pool = None
+        pools, self._pools = self._pools, []
+        await asyncio.gather(*(pool.close() for pool in pools))
 
-    async def fetchval(self, sql: str, *args):
-        if not self._pool:
+    def _pool(self, shard: int) -> asyncpg.Pool:
+        if not self._pools:
             raise RuntimeError("DB pool is not connected")
-        async with self._pool.acquire() as conn:
+        return self._pools[shard]
+
+    async def fetchval(self, sql: str, *args, shard: int = 0):
+        async with self._pool(shard).acquire() as conn:
             return await conn.fetchval(sql, *args)
 
+    async def fetch_all_shards(self, sql: str, *args) -> list[list[asyncpg.Record]]:
+        async def fetch(shard: int):
+            async with self._pool(shard).acquire() as conn:
+                return await conn.fetch(sql, *args)
+
+        return list(await asyncio.gather(*(fetch(i) for i in range(self.shard_count))))
+
+    async def execute(self, q: Query):
+        """
+        Запрос про одного креатора идёт только на его шард,
+        глобальный — параллельно на все шарды с последующей склейкой.
+        """
+        if not q.sql:
+            return None
+
+        if q.creator_id:
+            shard = shard_for_creator(q.creator_id, self.shard_count)
+            return await self.fetchval(q.sql, *q.args, shard=shard)
+
+        shard_rows = await self.fetch_all_shards(q.sql, *q.args)
+        return merge_shard_results(q, shard_rows)
+
 
 db = Database()
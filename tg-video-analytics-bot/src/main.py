@@ -5,7 +5,7 @@ from aiogram import Bot, Dispatcher
 from aiogram.types import Message
 
 from .db import db
-from .query_engine import build_sql
+from .query_engine import build_query
 
 
 dp = Dispatcher()
@@ -13,8 +13,8 @@ dp = Dispatcher()
 
 @dp.message()
 async def on_message(message: Message):
-    sql, args = build_sql(message.text or "")
-    val = await db.fetchval(sql, *args)
+    q = build_query(message.text or "")
+    val = await db.execute(q)
 
     # НИКАКОГО int() — ответы бывают строками (топ, даты и т.д.)
     await message.answer(str(val if val is not None else 0))
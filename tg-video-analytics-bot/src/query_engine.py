@@ -1,5 +1,6 @@
 import re
 import datetime as dt
+from dataclasses import dataclass
 from typing import Any, Tuple, Optional
 from datetime import date, time
 
@@ -32,6 +33,55 @@ for m, forms in _MONTH_ALIASES.items():
     for f in forms:
         _MONTH_WORD_TO_NUM[f] = m
 
+# Как собирать ответ глобального запроса из результатов отдельных шардов
+MERGE_SUM = "sum"              # каждый шард возвращает одно число
+MERGE_DATE_RANGE = "date_range"  # каждый шард возвращает (min_date, max_date) строками YYYY-MM-DD
+MERGE_TOP = "top"              # каждый шард возвращает свой топ (creator_id, cnt)
+MERGE_DISTINCT = "distinct"    # каждый шард возвращает список уникальных значений
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    Запрос к БД. Если задан creator_id — запрос целиком про одного креатора
+    и выполняется на его шарде (fetchval). Иначе sql выполняется на всех шардах,
+    а результаты склеиваются по правилу merge.
+    """
+    sql: str
+    args: Tuple[Any, ...] = ()
+    creator_id: Optional[str] = None
+    merge: str = MERGE_SUM
+    top_k: int = 0
+
+
+def merge_shard_results(q: Query, shard_rows: list[list[Any]]) -> Any:
+    """
+    shard_rows — по одному списку строк (asyncpg.Record / tuple) на каждый шард.
+    """
+    rows = [r for per_shard in shard_rows for r in per_shard]
+
+    if q.merge == MERGE_SUM:
+        return sum(r[0] or 0 for r in rows)
+
+    if q.merge == MERGE_DATE_RANGE:
+        firsts = [r[0] for r in rows if r[0] is not None]
+        lasts = [r[1] for r in rows if r[1] is not None]
+        if not firsts or not lasts:
+            return None
+        # YYYY-MM-DD сравниваются как строки так же, как даты
+        return f"{min(firsts)} {max(lasts)}"
+
+    if q.merge == MERGE_TOP:
+        # Креатор целиком живёт на одном шарде, поэтому топ-k каждого шарда
+        # содержит всех кандидатов в общий топ-k.
+        top = sorted(((r[0], int(r[1])) for r in rows), key=lambda x: (-x[1], x[0]))[: q.top_k]
+        return "\n".join(f"{cid} {cnt}" for cid, cnt in top) or None
+
+    if q.merge == MERGE_DISTINCT:
+        return len({r[0] for r in rows})
+
+    raise ValueError(f"Unknown merge strategy: {q.merge}")
+
 
 def _norm(text: str) -> str:
     return (text or "").lower().strip()
@@ -213,10 +263,11 @@ def _parse_time_range(s: str) -> tuple[time, time] | None:
     return (t1, t2)
 
 
-def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
+def build_query(text: str) -> Query:
     """
-    Возвращает (sql, args). Если не поняли вопрос — возвращаем ("", ()).
-    Все ответы стараемся вернуть одним значением (fetchval), даже топы/списки.
+    Возвращает Query. Если не поняли вопрос — Query("").
+    Запросы про одного креатора отдают одно значение (fetchval) на его шарде,
+    глобальные — строки с каждого шарда, которые склеиваются в merge_shard_results.
     """
     t = _norm(text)
     # 0.Y) В скольких разных календарных днях ноября 2025 креатор публиковал хотя бы одно видео?
@@ -234,7 +285,7 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
             and ("публик" in t or "опублик" in t or "выпуст" in t)
     ):
         creator_id = m_creator.group(0)
-        return (
+        return Query(
             """
             SELECT COUNT(DISTINCT (video_created_at::date))::bigint
             FROM videos
@@ -243,6 +294,7 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
               AND video_created_at <  '2025-12-01'::timestamptz
             """,
             (creator_id,),
+            creator_id=creator_id,
         )
 
     # 0) Суммарный рост просмотров креатора за интервал времени в конкретную дату (сумма delta_views_count)
@@ -254,7 +306,7 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
             ("вырос" in t) or ("суммар" in t) or ("на сколько" in t) or ("насколько" in t)) and ("с " in t) and (
             " до " in t):
         t_from, t_to = tr
-        return (
+        return Query(
             """
             SELECT COALESCE(SUM(s.delta_views_count), 0)::bigint
             FROM video_snapshots s
@@ -265,6 +317,7 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
               AND s.created_at::time <= $4::time
             """,
             (creator_id, d, t_from, t_to),
+            creator_id=creator_id,
         )
 
     # 0.X) Сколько разных креаторов имеют хотя бы одно видео с итоговыми просмотрами > 100000?
@@ -279,13 +332,13 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
             and ("в итоге" in t or "итог" in t)
             and ("100000" in digits)
     ):
-        return (
+        return Query(
             """
-            SELECT COUNT(DISTINCT creator_id)::bigint
+            SELECT DISTINCT creator_id
             FROM videos
             WHERE views_count > 100000
             """,
-            (),
+            merge=MERGE_DISTINCT,
         )
 
     # 1) Сколько всего видео в системе?
@@ -297,15 +350,15 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
             and ("креатор" not in t)
             and ("креатора" not in t)
     ):
-        return "SELECT COUNT(*)::bigint FROM videos", ()
+        return Query("SELECT COUNT(*)::bigint FROM videos")
 
     # 2) Сколько всего замеров статистики (по всем видео)?
     if ("замер" in t or "снимк" in t or "snapshot" in t) and ("всего" in t or "сколько" in t) and ("отриц" not in t) and ("меньше" not in t):
-        return "SELECT COUNT(*)::bigint FROM video_snapshots", ()
+        return Query("SELECT COUNT(*)::bigint FROM video_snapshots")
 
     # 3) Сколько замеров, где просмотры за час стали меньше (delta < 0)?
     if ("замер" in t or "снимк" in t or "snapshot" in t) and ("просмотр" in t) and ("час" in t) and ("меньше" in t or "отриц" in t):
-        return "SELECT COUNT(*)::bigint FROM video_snapshots WHERE delta_views_count < 0", ()
+        return Query("SELECT COUNT(*)::bigint FROM video_snapshots WHERE delta_views_count < 0")
 
     # 4) Сколько всего видео у креатора с id ...
     if ("сколько" in t) and ("видео" in t) and ("креатор" in t or "креатора" in t) and ("id" in t) and ("период" not in t):
@@ -313,7 +366,7 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
         if "просмотр" not in t:
             cid = _parse_creator_id(t)
             if cid:
-                return "SELECT COUNT(*)::bigint FROM videos WHERE creator_id = $1", (cid,)
+                return Query("SELECT COUNT(*)::bigint FROM videos WHERE creator_id = $1", (cid,), creator_id=cid)
 
     # 5) Сколько видео у креатора ... набрали больше N просмотров по итоговой статистике?
     if ("сколько" in t) and ("видео" in t) and ("креатор" in t or "креатора" in t) and ("id" in t) and ("просмотр" in t) and re.search(r"\b(больше|более|свыше|превысил[ао]?|выше)\b", t):
@@ -321,9 +374,10 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
         mthr = re.search(r"\b(?:больше|более|свыше|превысил[ао]?|выше)\s*([\d\s]+)\b", t)
         thr = _parse_int(mthr.group(1)) if mthr else 0
         if cid and thr > 0:
-            return (
+            return Query(
                 "SELECT COUNT(*)::bigint FROM videos WHERE creator_id = $1 AND views_count > $2",
                 (cid, thr),
+                creator_id=cid,
             )
 
     # 6) Сколько всего видео в системе набрали больше N просмотров по итоговой статистике?
@@ -331,47 +385,46 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
         mthr = re.search(r"\b(?:больше|более|свыше|превысил[ао]?|выше)\s*([\d\s]+)\b", t)
         thr = _parse_int(mthr.group(1)) if mthr else 0
         if thr > 0:
-            return "SELECT COUNT(*)::bigint FROM videos WHERE views_count > $1", (thr,)
+            return Query("SELECT COUNT(*)::bigint FROM videos WHERE views_count > $1", (thr,))
 
     # 7) Ранняя и поздняя дата публикации
     if ("самая ранняя" in t or "ранняя" in t) and ("самая поздняя" in t or "поздняя" in t) and ("дата" in t) and ("публикац" in t or "опублик" in t):
-        return (
+        return Query(
             f"""
             SELECT
-              to_char(MIN({PUBLISHED_COL}), 'YYYY-MM-DD') || ' ' || to_char(MAX({PUBLISHED_COL}), 'YYYY-MM-DD')
+              to_char(MIN({PUBLISHED_COL}), 'YYYY-MM-DD'),
+              to_char(MAX({PUBLISHED_COL}), 'YYYY-MM-DD')
             FROM videos
             """,
-            (),
+            merge=MERGE_DATE_RANGE,
         )
 
     # 8) Какой креатор выпустил больше всего видео и сколько?
     if ("какой" in t) and ("креатор" in t or "креатора" in t) and ("больше всего" in t) and ("видео" in t) and ("сколько" in t or "и сколько" in t):
-        return (
+        return Query(
             """
-            SELECT creator_id || ' ' || COUNT(*)::bigint
+            SELECT creator_id, COUNT(*)::bigint AS cnt
             FROM videos
             GROUP BY creator_id
-            ORDER BY COUNT(*) DESC, creator_id ASC
+            ORDER BY cnt DESC, creator_id ASC
             LIMIT 1
             """,
-            (),
+            merge=MERGE_TOP,
+            top_k=1,
         )
 
     # 9) Топ-5 креаторов по количеству видео
     if (("топ-5" in t) or ("топ 5" in t)) and ("креатор" in t or "креатора" in t) and ("видео" in t):
-        return (
+        return Query(
             """
-            WITH top5 AS (
-              SELECT creator_id, COUNT(*)::bigint AS cnt
-              FROM videos
-              GROUP BY creator_id
-              ORDER BY cnt DESC, creator_id ASC
-              LIMIT 5
-            )
-            SELECT COALESCE(string_agg(creator_id || ' ' || cnt::text, E'\n' ORDER BY cnt DESC, creator_id ASC), '')
-            FROM top5
+            SELECT creator_id, COUNT(*)::bigint AS cnt
+            FROM videos
+            GROUP BY creator_id
+            ORDER BY cnt DESC, creator_id ASC
+            LIMIT 5
             """,
-            (),
+            merge=MERGE_TOP,
+            top_k=5,
         )
 
     # 10) Сколько видео опубликовал креатор ... в период с ... по ... включительно
@@ -380,12 +433,13 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
         dr = _parse_ru_date_range_inclusive(t)
         if cid and dr:
             start, end = dr
-            return (
+            return Query(
                 f"SELECT COUNT(*)::bigint FROM videos WHERE creator_id=$1 AND {PUBLISHED_COL}::date BETWEEN $2 AND $3",
                 (cid, start, end),
+                creator_id=cid,
             )
         # если не смогли распарсить даты — лучше честно сказать "не понял", чем дать неверный ответ
-        return "", ()
+        return Query("")
 
     # 11) Суммарные просмотры всех видео, опубликованных в <месяце> <год>
     if ("суммар" in t or "сумм" in t) and ("просмотр" in t) and ("опублик" in t or "публикац" in t):
@@ -399,7 +453,7 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
             else:
                 next_month = dt.date(year, month + 1, 1)
 
-            return (
+            return Query(
                 f"""
                 SELECT COALESCE(SUM(views_count), 0)::bigint
                 FROM videos
@@ -409,4 +463,4 @@ def build_sql(text: str) -> Tuple[str, Tuple[Any, ...]]:
                 (start, next_month),
             )
 
-    return "", ()
+    return Query("")
@@ -0,0 +1,27 @@
+import hashlib
+import os
+
+
+def normalize_creator_id(creator_id: str) -> str:
+    # Тот же вид, к которому query_engine приводит id из текста вопроса
+    return (creator_id or "").replace("-", "").lower()
+
+
+def shard_for_creator(creator_id: str, shard_count: int) -> int:
+    """
+    Номер шарда для креатора. Хэш должен быть стабильным между процессами
+    (бот и load_json.py должны считать одинаково), поэтому не используем hash().
+    """
+    if shard_count <= 1:
+        return 0
+    digest = hashlib.md5(normalize_creator_id(creator_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def shard_dsns_from_env() -> list[str]:
+    """
+    DATABASE_SHARD_DSNS — список DSN через запятую, порядок важен (индекс = номер шарда).
+    Пустой список означает "шардирования нет", DSN берётся как раньше.
+    """
+    raw = os.getenv("DATABASE_SHARD_DSNS") or ""
+    return [dsn.strip() for dsn in raw.split(",") if dsn.strip()]